@@ -0,0 +1,27 @@
+"""
+Directory traversal shared by the extraction and indexing scripts.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+
+def iter_files(root: Union[str, Path], suffixes: Iterable[str]) -> Iterator[Path]:
+    """
+    Recursively yield files under root whose name ends with one of suffixes
+    (case-insensitive). Uses os.scandir so entry types come from the directory
+    listing and only matching files are turned into Path objects.
+    """
+    suffixes = tuple(s.lower() for s in suffixes)
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(suffixes) and entry.is_file():
+                        yield Path(entry.path)
+        except OSError as exc:
+            print(f"[!] Failed to scan directory: {exc}")
@@ -1,54 +1,187 @@
 #!/usr/bin/env python
 import argparse
+import os
+import shutil
 import subprocess
+import tempfile
+import warnings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, TextIO
 
 import fitz  # pymupdf
+import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
 
+from corpus_files import iter_files
 
-def extract_pdf(path: Path) -> str:
+
+# EPUB content documents are XHTML; parsing them with the lxml HTML parser is
+# intended, so don't warn once per item.
+warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+
+def normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def write_chunks(chunks: Iterable[str], out_fp: TextIO) -> None:
+    """
+    Write chunks separated by blank lines as they arrive, so the full document
+    text is never held in memory at once.
+    """
+    for i, chunk in enumerate(chunks):
+        if i:
+            out_fp.write("\n\n")
+        out_fp.write(chunk)
+
+
+# Pages per task when a PDF is split across processes; small enough that only
+# a few slices of text are held in memory at once.
+PDF_PAGES_PER_TASK = 16
+
+
+def extract_pdf_pages(path: Path, start: int, stop: int) -> List[str]:
+    """
+    Extract pages [start, stop) with a Document opened in this process.
+    """
     doc = fitz.open(path)
-    chunks = []
-    for page in doc:
-        # "text" gives a layout-ish text; "blocks" or "dict" are alternatives
-        chunks.append(page.get_text("text"))
-    return "\n\n".join(chunks)
+    try:
+        return [doc[i].get_text("text") for i in range(start, stop)]
+    finally:
+        doc.close()
+
 
+def extract_pdf(path: Path, page_workers: int = 1) -> Iterator[str]:
+    """
+    Yield the text of every page in order. With page_workers > 1, slices of
+    pages are extracted in separate processes (PyMuPDF holds the GIL, so
+    threads would not help) and a bounded window of slices is kept in flight.
+    """
+    if page_workers <= 1:
+        doc = fitz.open(path)
+        try:
+            for page in doc:
+                # "text" gives a layout-ish text; "blocks" or "dict" are alternatives
+                yield page.get_text("text")
+        finally:
+            doc.close()
+        return
 
-def extract_epub(path: Path) -> str:
+    doc = fitz.open(path)
+    page_count = doc.page_count
+    doc.close()
+
+    window: Deque["Future[List[str]]"] = deque()
+    with ProcessPoolExecutor(max_workers=page_workers) as ex:
+        for start in range(0, page_count, PDF_PAGES_PER_TASK):
+            stop = min(start + PDF_PAGES_PER_TASK, page_count)
+            window.append(ex.submit(extract_pdf_pages, path, start, stop))
+            if len(window) >= 2 * page_workers:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def extract_epub(path: Path) -> Iterator[str]:
     book = epub.read_epub(str(path))
-    chunks = []
     for item in book.get_items():
-        if item.get_type() == epub.EpubHtml:
+        if item.get_type() == ebooklib.ITEM_DOCUMENT:
             html = item.get_content().decode("utf-8", errors="ignore")
-            soup = BeautifulSoup(html, "html.parser")
-            text = soup.get_text(separator=" ", strip=True)
+            soup = BeautifulSoup(html, "lxml")
+            text = " ".join(soup.stripped_strings)
             if text:
-                chunks.append(text)
-    return "\n\n".join(chunks)
+                yield text
 
 
 def convert_mobi_to_epub(mobi_path: Path, tmp_dir: Path) -> Path:
     """
     Use Calibre's ebook-convert to turn MOBI into EPUB.
     Requires `ebook-convert` to be installed and on PATH.
+    Each conversion gets its own directory under tmp_dir, so documents with the
+    same name converted in parallel don't overwrite each other.
     """
-    epub_path = tmp_dir / (mobi_path.stem + ".epub")
-    epub_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    epub_path = Path(tempfile.mkdtemp(dir=tmp_dir)) / (mobi_path.stem + ".epub")
 
     cmd = ["ebook-convert", str(mobi_path), str(epub_path)]
-    subprocess.run(cmd, check=True)
+    try:
+        subprocess.run(cmd, check=True)
+    except BaseException:
+        shutil.rmtree(epub_path.parent, ignore_errors=True)
+        raise
     return epub_path
 
 
-def extract_mobi(path: Path, tmp_dir: Path) -> str:
+def extract_mobi(path: Path, tmp_dir: Path) -> Iterator[str]:
     """
     Simplest: MOBI -> EPUB -> text.
     """
     epub_path = convert_mobi_to_epub(path, tmp_dir)
-    return extract_epub(epub_path)
+    try:
+        yield from extract_epub(epub_path)
+    finally:
+        shutil.rmtree(epub_path.parent, ignore_errors=True)
+
+
+SUPPORTED_EXTS = {".pdf", ".epub", ".mobi"}
+
+
+def iter_source_files(raw_dir: Path) -> Iterator[Path]:
+    """
+    Yield every supported document under raw_dir.
+    """
+    yield from iter_files(raw_dir, SUPPORTED_EXTS)
+
+
+def extract_document(path: Path, tmp_dir: Path, page_workers: int = 1) -> Iterator[str]:
+    """
+    Yield the text of a PDF/EPUB/MOBI document chunk by chunk (pages for PDF,
+    content documents for EPUB), with newlines normalized.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        chunks = extract_pdf(path, page_workers)
+    elif suffix == ".epub":
+        chunks = extract_epub(path)
+    elif suffix == ".mobi":
+        chunks = extract_mobi(path, tmp_dir)
+    else:
+        raise ValueError(f"Unsupported file type: {path.suffix}")
+
+    for chunk in chunks:
+        # Basic cleanup
+        yield normalize_newlines(chunk)
+
+
+def extract_one(path: Path, raw_dir: Path, out_dir: Path, tmp_dir: Path, page_workers: int = 1) -> str:
+    """
+    Extract a single document to its .txt counterpart under out_dir.
+    Returns a status line for the caller to print.
+    """
+    rel = path.relative_to(raw_dir)
+    out_path = out_dir / rel.with_suffix(".txt")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    suffix = path.suffix.lower()
+    if suffix not in SUPPORTED_EXTS:
+        return f"[!] Skipped unsupported file {path}"
+
+    # Write next to the target and swap it in only on success, so a failed run
+    # neither truncates a previous good .txt nor leaves a partial one behind.
+    part_path = out_path.with_suffix(".txt.part")
+    try:
+        with open(part_path, "w", encoding="utf-8", newline="\n", buffering=1 << 20) as out_fp:
+            write_chunks(extract_document(path, tmp_dir, page_workers), out_fp)
+        os.replace(part_path, out_path)
+    except Exception as e:
+        part_path.unlink(missing_ok=True)
+        return f"[!] Failed on {path}: {e}"
+
+    return f"[*] Extracted {path} -> {out_path}"
 
 
 def main():
@@ -71,41 +204,37 @@ def main():
         default=Path("../corpus/tmp"),
         help="Temporary directory for conversions (e.g. MOBI->EPUB)."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes (defaults to the number of CPUs)."
+    )
+    parser.add_argument(
+        "--page-workers",
+        type=int,
+        default=1,
+        help="Number of processes extracting pages of a single PDF (1 = sequential)."
+    )
     args = parser.parse_args()
 
     args.out_dir.mkdir(parents=True, exist_ok=True)
     args.tmp_dir.mkdir(parents=True, exist_ok=True)
 
-    supported_exts = {".pdf", ".epub", ".mobi"}
+    paths = list(iter_source_files(args.raw_dir))
 
-    for path in args.raw_dir.rglob("*"):
-        if not path.is_file():
-            continue
-        if path.suffix.lower() not in supported_exts:
-            continue
-
-        rel = path.relative_to(args.raw_dir)
-        out_path = args.out_dir / rel.with_suffix(".txt")
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        print(f"[*] Extracting {path} -> {out_path}")
-
-        try:
-            if path.suffix.lower() == ".pdf":
-                text = extract_pdf(path)
-            elif path.suffix.lower() == ".epub":
-                text = extract_epub(path)
-            elif path.suffix.lower() == ".mobi":
-                text = extract_mobi(path, args.tmp_dir)
-            else:
-                continue
-
-            # Basic cleanup
-            text = text.replace("\r\n", "\n").replace("\r", "\n")
-
-            out_path.write_text(text, encoding="utf-8")
-        except Exception as e:
-            print(f"[!] Failed on {path}: {e}")
+    # PDF layout analysis is CPU-bound and MOBI conversion shells out to
+    # Calibre, so extract documents in separate processes.
+    worker = partial(
+        extract_one,
+        raw_dir=args.raw_dir,
+        out_dir=args.out_dir,
+        tmp_dir=args.tmp_dir,
+        page_workers=args.page_workers,
+    )
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        for status in ex.map(worker, paths):
+            print(status)
 
 
 if __name__ == "__main__":
@@ -3,7 +3,8 @@
 Index extracted corpus text into a Qdrant vector database using Ollama embeddings.
 
 Assumptions:
-- Text files already exist under ../corpus/text (or a custom --text-dir).
+- Text files already exist under ../corpus/text (or a custom --text-dir), or
+  --direct is given and documents under ../corpus/source are extracted on the fly.
 - An Ollama server is reachable (local or remote) and has an embedding model pulled.
 - A Qdrant instance is reachable (local or remote).
 
@@ -17,76 +18,488 @@ Example:
 """
 
 import argparse
-import itertools
+import asyncio
+import hashlib
+import mmap
 import os
+import re
+import sqlite3
+import uuid
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar, Union
 
-import requests
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+import httpx
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+from qdrant_client.http.models import Distance, VectorParams
 from tqdm import tqdm
 
+from corpus_files import iter_files
+
+
+T = TypeVar("T")
+Batch = List[Tuple[Path, int, str]]
+
+# int8 scalar quantization keeps a 4x smaller copy of every vector in RAM for
+# search; the original float32 vectors remain on disk for rescoring.
+QUANTIZATION_CONFIG = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True,
+    ),
+)
+
+
+# Ollama answers with these while it is loading a model or overloaded.
+RETRY_STATUSES = {502, 503, 504}
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.3
+
+# Namespace for deterministic point IDs, so reindexing overwrites points in place.
+POINT_ID_NAMESPACE = uuid.UUID("5f0b8c4e-2d0a-4c3b-9a7e-6c1f3d2b8a91")
+
+# Qdrant's server-side default indexing_threshold (in kB). Used when a
+# collection doesn't report its own, or still has indexing disabled by an
+# interrupted run.
+DEFAULT_INDEXING_THRESHOLD = 10000
+
+# A paragraph is a run of non-empty lines, i.e. text between blank-line breaks.
+# Line breaks may be \n, \r\n or \r, as with text-mode reads, so .txt files
+# written on Windows split the same way.
+PARAGRAPH_RE = re.compile(rb"[^\r\n]+(?:(?:\r\n|\r|\n)(?!\r\n|\r|\n)[^\r\n]+)*")
+CR_LINE_BREAK_RE = re.compile(rb"\r\n?")
+
+
+def split_paragraphs(data: Union[bytes, mmap.mmap]) -> Iterator[str]:
+    """
+    Yield the paragraphs in a UTF-8 buffer (bytes or mmap) longer than 40 bytes.
+    Only the paragraph currently being yielded is decoded.
+    """
+    for match in PARAGRAPH_RE.finditer(data):
+        # Cheap span check first; only survivors are copied and stripped.
+        if match.end() - match.start() <= 40:
+            continue
+        raw = match.group()
+        if b"\r" in raw:
+            raw = CR_LINE_BREAK_RE.sub(b"\n", raw)
+        raw = raw.strip()
+        if len(raw) <= 40:
+            continue
+        yield raw.decode("utf-8", errors="ignore").strip()
+
+
+def iter_file_paragraphs(txt_path: Path) -> Iterator[str]:
+    """
+    Yield the paragraphs of a single .txt file. The file is memory-mapped,
+    so it is never read into memory as a whole.
+    """
+    if txt_path.stat().st_size == 0:
+        return
+
+    with open(txt_path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield from split_paragraphs(mm)
+
 
 def iter_paragraphs(text_root: Path) -> Iterable[Tuple[Path, int, str]]:
     """
     Yield (file_path, paragraph_index, paragraph_text) for all .txt files.
     A simple paragraph split on double newlines; very short chunks are skipped.
     """
-    for txt_path in text_root.rglob("*.txt"):
-        if not txt_path.is_file():
-            continue
+    for txt_path in iter_files(text_root, [".txt"]):
         try:
-            text = txt_path.read_text(encoding="utf-8", errors="ignore")
-        except Exception as exc:
+            for idx, para in enumerate(iter_file_paragraphs(txt_path)):
+                yield txt_path, idx, para
+        except OSError as exc:
             print(f"[!] Failed to read {txt_path}: {exc}")
             continue
 
-        raw_paragraphs = [p.strip() for p in text.split("\n\n")]
-        paragraphs = [p for p in raw_paragraphs if len(p) > 40]
 
-        for idx, para in enumerate(paragraphs):
-            yield txt_path, idx, para
+def iter_source_paragraphs(
+    source_root: Path,
+    tmp_dir: Path,
+    page_workers: int = 1,
+) -> Iterable[Tuple[Path, int, str]]:
+    """
+    Yield (file_path, paragraph_index, paragraph_text) straight from the
+    PDF/EPUB/MOBI documents under source_root, without writing .txt files.
+    Every extracted chunk ends a paragraph, exactly as the blank line between
+    chunks does in extract_source_text's output, so the paragraphs match.
+    """
+    # Imported here so the default .txt mode doesn't need the extraction dependencies.
+    from extract_source_text import extract_document, iter_source_files
+
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    for path in iter_source_files(source_root):
+        try:
+            chunks = extract_document(path, tmp_dir, page_workers)
+            paragraphs = (para for chunk in chunks for para in split_paragraphs(chunk.encode("utf-8")))
+            for idx, para in enumerate(paragraphs):
+                yield path, idx, para
+        except Exception as exc:
+            print(f"[!] Failed on {path}: {exc}")
+            continue
 
 
-def get_embedding(
-    session: requests.Session,
+def iter_batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Group an iterable into lists of at most `size` items.
+    """
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def get_embeddings(
+    http: httpx.AsyncClient,
     ollama_url: str,
     model: str,
-    text: str,
-) -> List[float]:
+    texts: List[str],
+) -> np.ndarray:
     """
-    Call Ollama's /api/embeddings endpoint for a single piece of text.
+    Call Ollama's /api/embed endpoint for a batch of texts in a single request.
+    Embeddings are returned as a float32 array with one row per text, in the
+    same order as `texts`.
     """
-    url = ollama_url.rstrip("/") + "/api/embeddings"
-    resp = session.post(url, json={"model": model, "prompt": text})
+    url = ollama_url.rstrip("/") + "/api/embed"
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        resp = await http.post(url, json={"model": model, "input": texts})
+        if resp.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS:
+            break
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
     resp.raise_for_status()
     data = resp.json()
-    return data["embedding"]
+    return np.asarray(data["embeddings"], dtype=np.float32)
+
+
+def point_id(path: Path, root: Path, idx: int, text: str) -> str:
+    """
+    Derive a stable UUID for a paragraph from its location and content.
+    The location is the path relative to the corpus root without its suffix,
+    so the ID doesn't depend on the working directory or on whether the
+    paragraph came from a .txt file or straight from its source document.
+    """
+    doc_key = path.relative_to(root).with_suffix("").as_posix()
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{doc_key}:{idx}:{digest}"))
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of embeddings in a single SQLite database, so that
+    unchanged paragraphs are not re-embedded when the corpus is reindexed.
+    Vectors are stored as raw float32 bytes.
+    """
+
+    def __init__(self, cache_dir: Path, commit_every: int = 1000) -> None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(cache_dir / "cache.db"))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self.commit_every = commit_every
+        self.uncommitted = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        # The model name is part of the key: vectors from different models
+        # are not interchangeable.
+        return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", keys
+        )
+        return {h: np.frombuffer(vec, dtype=np.float32) for h, vec in rows}
+
+    def put_many(self, items: List[Tuple[bytes, np.ndarray]]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (hash, vec) VALUES (?, ?)",
+            [(h, emb.tobytes()) for h, emb in items],
+        )
+        self.uncommitted += len(items)
+        if self.uncommitted >= self.commit_every:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
 
 
-def ensure_collection(
-    client: QdrantClient,
+async def ensure_collection(
+    client: AsyncQdrantClient,
     collection_name: str,
     dim: int,
     distance: Distance = Distance.COSINE,
 ) -> None:
     """
-    Create or recreate the collection with the given dimensionality.
-    If the collection exists with a different dimension, it will be recreated.
+    Create the collection if it does not exist yet. An existing collection is
+    reused if its vector size matches dim and recreated otherwise.
     """
-    existing = client.get_collection(collection_name=collection_name)
-    existing_dim = existing.vectors_count or existing.config.params.vectors.size  # type: ignore[attr-defined]
+    if await client.collection_exists(collection_name=collection_name):
+        existing = await client.get_collection(collection_name=collection_name)
+        existing_dim = existing.config.params.vectors.size  # type: ignore[union-attr]
 
-    if existing_dim == dim:
-        print(f"[*] Reusing existing collection '{collection_name}' with dim={dim}")
-        return
+        if existing_dim == dim:
+            print(f"[*] Reusing existing collection '{collection_name}' with dim={dim}")
+            return
 
-    print(f"[*] Recreating collection '{collection_name}' with dim={dim}")
-    client.recreate_collection(
+        print(f"[*] Recreating collection '{collection_name}' with dim={dim} (was {existing_dim})")
+        await client.delete_collection(collection_name=collection_name)
+    else:
+        print(f"[*] Creating collection '{collection_name}' with dim={dim}")
+
+    await client.create_collection(
         collection_name=collection_name,
-        vectors_config=VectorParams(size=dim, distance=distance),
+        vectors_config=VectorParams(
+            size=dim,
+            distance=distance,
+            quantization_config=QUANTIZATION_CONFIG,
+        ),
+    )
+
+
+async def index_corpus(args: argparse.Namespace) -> None:
+    """
+    Embed all paragraphs under args.text_dir and upsert them into Qdrant.
+    Up to args.concurrency embedding requests are kept in flight at once.
+    """
+    # Only count files here; counting paragraphs would read the whole corpus twice.
+    if args.direct:
+        from extract_source_text import iter_source_files
+
+        if not args.source_dir.exists():
+            raise SystemExit(f"Source directory not found: {args.source_dir}")
+
+        total_files = sum(1 for _ in iter_source_files(args.source_dir))
+        if total_files == 0:
+            print("[!] No PDF/EPUB/MOBI files found in source directory.")
+            return
+
+        print(f"[*] Found {total_files} source documents to index.")
+        paragraphs = iter_source_paragraphs(args.source_dir, args.tmp_dir, args.page_workers)
+    else:
+        if not args.text_dir.exists():
+            raise SystemExit(f"Text directory not found: {args.text_dir}")
+
+        total_files = sum(1 for _ in iter_files(args.text_dir, [".txt"]))
+        if total_files == 0:
+            print("[!] No .txt files found in text directory.")
+            return
+
+        print(f"[*] Found {total_files} text files to index.")
+        paragraphs = iter_paragraphs(args.text_dir)
+
+    # Qdrant client: can point to local or remote host.
+    # gRPC sends vectors as packed floats instead of JSON number arrays.
+    client = AsyncQdrantClient(
+        url=args.qdrant_url,
+        api_key=args.qdrant_api_key or None,
+        prefer_grpc=True,
+        grpc_port=args.qdrant_grpc_port,
+    )
+
+    # Keep one persistent connection per concurrent request; the transport
+    # also retries requests whose connection could not be established.
+    http = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=args.concurrency,
+                max_keepalive_connections=args.concurrency,
+            ),
+            retries=RETRY_ATTEMPTS,
+        ),
+        timeout=None,
+    )
+
+    cache = EmbeddingCache(args.cache_dir) if args.cache_dir else None
+
+    try:
+        await index_paragraphs(args, client, http, cache, iter(paragraphs))
+    finally:
+        await http.aclose()
+        await client.close()
+        if cache is not None:
+            cache.close()
+
+
+async def index_paragraphs(
+    args: argparse.Namespace,
+    client: AsyncQdrantClient,
+    http: httpx.AsyncClient,
+    cache: Optional[EmbeddingCache],
+    paragraphs: Iterator[Tuple[Path, int, str]],
+) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def embed_texts(texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, serving what we can from the cache and sending only the
+        misses to Ollama.
+        """
+        if cache is None:
+            async with semaphore:
+                return await get_embeddings(http, args.ollama_url, args.ollama_model, texts)
+
+        keys = [cache.key(args.ollama_model, text) for text in texts]
+        found = cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            async with semaphore:
+                fresh = await get_embeddings(
+                    http,
+                    args.ollama_url,
+                    args.ollama_model,
+                    [texts[i] for i in missing],
+                )
+            cache.put_many([(keys[i], emb) for i, emb in zip(missing, fresh)])
+            found.update((keys[i], emb) for i, emb in zip(missing, fresh))
+        return np.stack([found[key] for key in keys])
+
+    # Peek the first paragraph to determine embedding dimension and ensure collection.
+    try:
+        first_path, first_idx, first_text = next(paragraphs)
+    except StopIteration:
+        print("[!] No paragraphs found.")
+        return
+
+    print(f"[*] Getting embedding dimension from first paragraph in {first_path}")
+    first_embedding = (await embed_texts([first_text]))[0]
+    dim = len(first_embedding)
+    print(f"[*] Embedding dimension: {dim}")
+
+    await ensure_collection(client, args.collection, dim)
+
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    payloads: List[dict] = []
+    upserts: Set["asyncio.Task[object]"] = set()
+
+    corpus_root = args.source_dir if args.direct else args.text_dir
+
+    def add_point(path: Path, idx: int, para: str, emb: np.ndarray) -> None:
+        ids.append(point_id(path, corpus_root, idx, para))
+        vectors.append(emb)
+        payloads.append({
+            "file": str(path),
+            "paragraph_index": idx,
+            "text": para,
+        })
+
+    async def reap_upserts(block: bool) -> None:
+        """
+        Drop finished upsert tasks, re-raising the first failure so a rejected
+        batch stops the run instead of surfacing only after the whole corpus is
+        embedded. With block=True, wait until at least one upsert finishes.
+        """
+        nonlocal upserts
+        if block:
+            done, upserts = await asyncio.wait(upserts, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            done = {task for task in upserts if task.done()}
+            upserts -= done
+        for task in done:
+            task.result()
+
+    async def flush() -> int:
+        """
+        Schedule an upsert of the buffered points without waiting for Qdrant to
+        finish indexing them, and reset the buffer. At most args.concurrency
+        upserts are in flight. Returns the number of points sent.
+        """
+        await reap_upserts(block=len(upserts) >= args.concurrency)
+
+        # Vectors stay float32 arrays until here; the REST models need plain lists.
+        batch = models.Batch(ids=list(ids), vectors=np.stack(vectors).tolist(), payloads=list(payloads))
+        upserts.add(asyncio.create_task(
+            client.upsert(collection_name=args.collection, points=batch, wait=False)
+        ))
+        count = len(ids)
+        ids.clear()
+        vectors.clear()
+        payloads.clear()
+        return count
+
+    async def embed_batch(batch: Batch) -> Tuple[Batch, np.ndarray]:
+        return batch, await embed_texts([para for _, _, para in batch])
+
+    progress = tqdm(desc="Indexing paragraphs", unit="para")
+
+    # Upserts run as background tasks alongside the embedding requests.
+    async def handle(batch: Batch, embeddings: np.ndarray) -> None:
+        for (path, idx, para), emb in zip(batch, embeddings):
+            add_point(path, idx, para, emb)
+        progress.update(len(batch))
+
+        if len(ids) >= args.batch_size:
+            count = await flush()
+            print(f"[*] Queued upsert of {count} points (last file: {batch[-1][0]})")
+
+    # Build the HNSW index once at the end instead of continuously re-optimizing
+    # segments while points are still arriving.
+    info = await client.get_collection(collection_name=args.collection)
+    indexing_threshold = info.config.optimizer_config.indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+
+    async def restore_indexing() -> None:
+        await client.update_collection(
+            collection_name=args.collection,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+        )
+
+    await client.update_collection(
+        collection_name=args.collection,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
     )
+    try:
+        add_point(first_path, first_idx, first_text, first_embedding)
+        progress.update(1)
+
+        # Only schedule a bounded window of batches so the corpus is never fully
+        # materialized in memory.
+        pending: Set["asyncio.Task[Tuple[Batch, np.ndarray]]"] = set()
+        batches = iter_batches(paragraphs, args.embed_batch_size)
+        while True:
+            # Reading (or, in --direct mode, extracting) the next batch runs in a
+            # worker thread so in-flight requests keep being serviced meanwhile.
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            if len(pending) >= args.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    await handle(*task.result())
+            pending.add(asyncio.create_task(embed_batch(batch)))
+
+        for next_done in asyncio.as_completed(pending):
+            await handle(*(await next_done))
+
+        progress.close()
+
+        if ids:
+            count = await flush()
+            print(f"[*] Queued final upsert of {count} points.")
+
+        await asyncio.gather(*upserts)
+    except BaseException:
+        # Still try to re-enable indexing, but don't let a failure here (e.g.
+        # Qdrant being unreachable) hide the error that stopped the run.
+        try:
+            await restore_indexing()
+        except Exception as exc:
+            print(f"[!] Failed to restore indexing_threshold={indexing_threshold}: {exc}")
+        raise
+
+    await restore_indexing()
+
+    print("[*] Indexing complete.")
 
 
 def main() -> None:
@@ -97,6 +510,29 @@ def main() -> None:
         default=Path("../corpus/text"),
         help="Root directory containing extracted .txt files.",
     )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="Extract paragraphs straight from --source-dir documents instead of reading .txt files.",
+    )
+    parser.add_argument(
+        "--source-dir",
+        type=Path,
+        default=Path("../corpus/source"),
+        help="Root directory containing PDF/EPUB/MOBI documents (used with --direct).",
+    )
+    parser.add_argument(
+        "--tmp-dir",
+        type=Path,
+        default=Path("../corpus/tmp"),
+        help="Temporary directory for MOBI->EPUB conversion (used with --direct).",
+    )
+    parser.add_argument(
+        "--page-workers",
+        type=int,
+        default=1,
+        help="Number of processes extracting pages of a single PDF (used with --direct; 1 = sequential).",
+    )
     parser.add_argument(
         "--collection",
         type=str,
@@ -121,6 +557,12 @@ def main() -> None:
         default=os.environ.get("QDRANT_URL", "http://localhost:6333"),
         help="Base URL for the Qdrant service.",
     )
+    parser.add_argument(
+        "--qdrant-grpc-port",
+        type=int,
+        default=int(os.environ.get("QDRANT_GRPC_PORT", "6334")),
+        help="gRPC port of the Qdrant service.",
+    )
     parser.add_argument(
         "--qdrant-api-key",
         type=str,
@@ -131,91 +573,29 @@ def main() -> None:
         "--batch-size",
         type=int,
         default=64,
-        help="Number of points per Qdrant upsert batch.",
+        help="Number of points per Qdrant upsert batch (32-128 works well).",
     )
-    args = parser.parse_args()
-
-    if not args.text_dir.exists():
-        raise SystemExit(f"Text directory not found: {args.text_dir}")
-
-    # Count paragraphs for progress reporting.
-    total_paragraphs = sum(1 for _ in iter_paragraphs(args.text_dir))
-    if total_paragraphs == 0:
-        print("[!] No paragraphs found in text directory.")
-        return
-
-    print(f"[*] Found {total_paragraphs} paragraphs to index.")
-
-    # Qdrant client: can point to local or remote host.
-    client = QdrantClient(
-        url=args.qdrant_url,
-        api_key=args.qdrant_api_key or None,
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=32,
+        help="Number of paragraphs sent to Ollama per embedding request.",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of embedding requests in flight at once.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Directory for an on-disk embedding cache; unchanged paragraphs are not re-embedded.",
+    )
+    args = parser.parse_args()
 
-    session = requests.Session()
-
-    paragraphs = iter_paragraphs(args.text_dir)
-
-    # Peek the first paragraph to determine embedding dimension and ensure collection.
-    try:
-        first_path, first_idx, first_text = next(paragraphs)
-    except StopIteration:
-        print("[!] No paragraphs found in text directory.")
-        return
-
-    print(f"[*] Getting embedding dimension from first paragraph in {first_path}")
-    first_embedding = get_embedding(session, args.ollama_url, args.ollama_model, first_text)
-    dim = len(first_embedding)
-    print(f"[*] Embedding dimension: {dim}")
-
-    # Create or check collection.
-    try:
-        ensure_collection(client, args.collection, dim)
-    except Exception:
-        # If collection does not exist yet, create it.
-        print(f"[*] Creating collection '{args.collection}' with dim={dim}")
-        client.recreate_collection(
-            collection_name=args.collection,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
-        )
-
-    # Helper to stream paragraphs including the first one we already embedded.
-    def all_paragraphs():
-        yield first_path, first_idx, first_text, first_embedding
-        for path, idx, para in paragraphs:
-            yield path, idx, para, None
-
-    point_id_counter = itertools.count()
-    buffer: List[PointStruct] = []
-
-    for path, idx, para, maybe_emb in tqdm(
-        all_paragraphs(),
-        total=total_paragraphs,
-        desc="Indexing paragraphs",
-    ):
-        if maybe_emb is None:
-            emb = get_embedding(session, args.ollama_url, args.ollama_model, para)
-        else:
-            emb = maybe_emb
-
-        pid = next(point_id_counter)
-        payload = {
-            "file": str(path),
-            "paragraph_index": idx,
-            "text": para,
-        }
-        buffer.append(PointStruct(id=pid, vector=emb, payload=payload))
-
-        if len(buffer) >= args.batch_size:
-            client.upsert(collection_name=args.collection, points=buffer)
-            print(f"[*] Upserted {len(buffer)} points (last file: {path})")
-            buffer.clear()
-
-    if buffer:
-        client.upsert(collection_name=args.collection, points=buffer)
-        print(f"[*] Upserted final {len(buffer)} points.")
-
-    print("[*] Indexing complete.")
+    asyncio.run(index_corpus(args))
 
 
 if __name__ == "__main__":
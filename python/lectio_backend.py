@@ -1,14 +1,19 @@
 #!/usr/bin/env python
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
 import os
-from typing import List
+from typing import AsyncIterator, List
 
-import requests
+import httpx
+import numpy as np
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
 from qdrant_client.http.models import ScoredPoint
 
 
@@ -19,11 +24,67 @@ ADDIN_DIR = BASE_DIR / "word-addin"
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://192.168.178.237:11434")
 OLLAMA_EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "mxbai-embed-large")
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://192.168.178.237:6333")
+QDRANT_GRPC_PORT = int(os.environ.get("QDRANT_GRPC_PORT", "6334"))
 QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY") or None
 QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "lectio_corpus")
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "1024"))
+
+# Ollama answers with these while it is loading a model or overloaded.
+RETRY_STATUSES = {502, 503, 504}
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.3
+
+# The collection is int8-quantized; rescore the oversampled candidates with
+# the original vectors so ranking stays close to unquantized search. Lower
+# hnsw_ef trades recall for latency.
+SEARCH_PARAMS = models.SearchParams(
+    hnsw_ef=64,
+    exact=False,
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0),
+)
+
+# Only the payload fields that end up in SearchResult.
+RESULT_PAYLOAD_FIELDS = ["file", "paragraph_index", "text"]
+
+
+# Created on startup and closed on shutdown; see lifespan().
+client: AsyncQdrantClient
+http: httpx.AsyncClient
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    global client, http
+    # One client shared by all requests. Keepalive pings stop idle gRPC
+    # channels from being dropped between searches, and the explicit REST
+    # pool limit only matters if Qdrant falls back to HTTP.
+    client = AsyncQdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=True,
+        grpc_port=QDRANT_GRPC_PORT,
+        grpc_options={
+            "grpc.keepalive_time_ms": 30000,
+            "grpc.max_receive_message_length": 32 << 20,
+        },
+        timeout=10,
+        limits=httpx.Limits(max_connections=64),
+    )
+    http = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            retries=RETRY_ATTEMPTS,
+        ),
+        timeout=30,
+    )
+    try:
+        yield
+    finally:
+        await http.aclose()
+        await client.close()
 
 
-app = FastAPI(title="Lectio Backend", version="0.1.0")
+app = FastAPI(title="Lectio Backend", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,10 +99,6 @@ if ADDIN_DIR.exists():
     app.mount("/addin", StaticFiles(directory=str(ADDIN_DIR), html=True), name="addin")
 
 
-client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-session = requests.Session()
-
-
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
@@ -58,15 +115,36 @@ class SearchResponse(BaseModel):
     results: List[SearchResult]
 
 
-def get_embedding(text: str) -> List[float]:
+# LRU of query embeddings, so repeated queries skip the Ollama round-trip.
+# Only touched from the event loop, so no locking is needed.
+embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+async def get_embedding(text: str) -> np.ndarray:
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        embedding_cache.move_to_end(text)
+        return cached
+
     url = OLLAMA_URL.rstrip("/") + "/api/embeddings"
-    resp = session.post(url, json={"model": OLLAMA_EMBED_MODEL, "prompt": text})
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        resp = await http.post(url, json={"model": OLLAMA_EMBED_MODEL, "prompt": text})
+        if resp.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS:
+            break
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
     try:
         resp.raise_for_status()
-    except requests.HTTPError as exc:
+    except httpx.HTTPStatusError as exc:
         raise HTTPException(status_code=502, detail=f"Ollama error: {exc}") from exc
     data = resp.json()
-    return data["embedding"]
+    embedding = np.asarray(data["embedding"], dtype=np.float32)
+    # The same array is handed to every caller with this query.
+    embedding.flags.writeable = False
+
+    embedding_cache[text] = embedding
+    if len(embedding_cache) > EMBED_CACHE_SIZE:
+        embedding_cache.popitem(last=False)
+    return embedding
 
 
 def point_to_result(point: ScoredPoint) -> SearchResult:
@@ -80,33 +158,36 @@ def point_to_result(point: ScoredPoint) -> SearchResult:
 
 
 @app.get("/health")
-def health() -> dict:
+async def health() -> dict:
     return {"status": "ok"}
 
 
 @app.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest) -> SearchResponse:
+async def search(req: SearchRequest) -> SearchResponse:
     query = req.query.strip()
     if not query:
         raise HTTPException(status_code=400, detail="Query text is empty.")
 
     try:
-        embedding = get_embedding(query)
+        embedding = await get_embedding(query)
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(status_code=502, detail=f"Failed to get embedding: {exc}") from exc
 
     try:
-        points = client.search(
+        response = await client.query_points(
             collection_name=QDRANT_COLLECTION,
-            query_vector=embedding,
+            query=embedding,
             limit=req.top_k,
+            with_payload=RESULT_PAYLOAD_FIELDS,
+            with_vectors=False,
+            search_params=SEARCH_PARAMS,
         )
     except Exception as exc:
         raise HTTPException(status_code=502, detail=f"Qdrant search failed: {exc}") from exc
 
-    results = [point_to_result(p) for p in points]
+    results = [point_to_result(p) for p in response.points]
     return SearchResponse(results=results)
 
 